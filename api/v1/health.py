@@ -1,30 +1,76 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from typing import Dict, Any
+import asyncio
 import time
 import os
 import psutil
 import platform
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
 from services.vector import get_vector_service
 from services.retriever import HybridRetriever
+from .rag import get_retriever
 
 router = APIRouter(prefix="/v1/health", tags=["Health Monitoring"])
 
-# 存储性能指标历史
+# 存储性能指标历史，每项只保留最近100个数据点
 metrics_history = {
-    "total_docs": [],
-    "today_updates": [],
-    "success_rate": [],
-    "avg_response": []
+    key: deque(maxlen=100)
+    for key in ("total_docs", "today_updates", "success_rate", "avg_response")
 }
 
-# 模拟数据
-last_update = datetime.now()
-total_docs = 12458
-today_updates = 142
-success_rate = 0.987
-avg_response = 286
+# 单个依赖服务检查的超时时间（秒）
+CHECK_TIMEOUT = 5.0
+
+# 依赖服务状态缓存时间（秒），避免频繁的探活请求压到后端
+SERVICES_CACHE_TTL = 2.0
+
+# 依赖服务状态缓存
+_services_cache: Dict[str, Any] = {"at": 0.0, "value": None}
+_services_lock = asyncio.Lock()
+
+# 系统资源采样间隔（秒）
+SYS_SAMPLE_INTERVAL = 2.0
+
+# 模拟数据更新间隔（秒）
+HEALTH_UPDATE_INTERVAL = 60.0
+
+@dataclass
+class HealthState:
+    """健康指标状态（模拟数据），挂载在 app.state.health 上"""
+    total_docs: int = 12458
+    today_updates: int = 142
+    success_rate: float = 0.987
+    avg_response: int = 286
+    last_update_mono: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    async def maybe_update(self):
+        """距上次更新超过更新间隔时刷新模拟数据，锁保证并发请求只更新一次"""
+        if time.monotonic() - self.last_update_mono <= HEALTH_UPDATE_INTERVAL:
+            return
+
+        async with self.lock:
+            if time.monotonic() - self.last_update_mono <= HEALTH_UPDATE_INTERVAL:
+                return
+
+            now = time.time()
+            self.total_docs += int(5 * (0.5 + 0.5 * (now % 10) / 10))
+            self.today_updates = int(self.today_updates * 1.01)
+            self.success_rate = min(0.999, self.success_rate + 0.001 * (now % 3 - 1))
+            self.avg_response = max(100, self.avg_response - 1 + int(5 * (now % 3 - 1)))
+            self.last_update_mono = time.monotonic()
+
+    def metrics(self) -> Dict[str, Any]:
+        """当前指标值"""
+        return {
+            "total_docs": self.total_docs,
+            "today_updates": self.today_updates,
+            "success_rate": self.success_rate,
+            "avg_response": self.avg_response
+        }
 
 @router.get(
     "",
@@ -34,45 +80,33 @@ avg_response = 286
         500: {"description": "服务异常"}
     }
 )
-async def get_health():
+async def get_health(request: Request, response: Response):
     """
     获取RAG服务的健康状态和关键指标
     """
-    global last_update, total_docs, today_updates, success_rate, avg_response
+    state: HealthState = request.app.state.health
 
     try:
-        # 模拟数据更新
-        current_time = datetime.now()
-        if (current_time - last_update).total_seconds() > 60:
-            # 每分钟更新一次模拟数据
-            total_docs += int(5 * (0.5 + 0.5 * (time.time() % 10) / 10))
-            today_updates = int(today_updates * 1.01)
-            success_rate = min(0.999, success_rate + 0.001 * (time.time() % 3 - 1))
-            avg_response = max(100, avg_response - 1 + int(5 * (time.time() % 3 - 1)))
-            last_update = current_time
-
-        # 获取系统信息
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        # 每分钟更新一次模拟数据
+        await state.maybe_update()
+
+        # 获取依赖服务状态
+        services = await cached_check_services()
+        response.headers["Cache-Control"] = f"max-age={int(SERVICES_CACHE_TTL)}"
+
+        # 读取后台采样的系统信息
+        snapshot = request.app.state.sys_snapshot
 
         return {
             "status": "healthy",
             "timestamp": time.time(),
             "system": {
-                "cpu_percent": cpu_percent,
-                "memory_percent": memory.percent,
-                "disk_percent": disk.percent,
+                **snapshot,
                 "platform": platform.platform(),
                 "python_version": platform.python_version()
             },
-            "metrics": {
-                "total_docs": total_docs,
-                "today_updates": today_updates,
-                "success_rate": success_rate,
-                "avg_response": avg_response
-            },
-            "services": await check_services()
+            "metrics": state.metrics(),
+            "services": services
         }
     except Exception as e:
         return {
@@ -81,6 +115,36 @@ async def get_health():
             "timestamp": time.time()
         }
 
+def sample_system() -> Dict[str, Any]:
+    """
+    采样系统资源使用情况
+
+    cpu_percent使用非阻塞模式，返回距上次采样以来的平均CPU使用率
+
+    Returns:
+        系统资源快照
+    """
+    memory = psutil.virtual_memory()
+    disk = psutil.disk_usage('/')
+
+    return {
+        "cpu_percent": psutil.cpu_percent(interval=None),
+        "memory_percent": memory.percent,
+        "disk_percent": disk.percent
+    }
+
+async def run_system_sampler(state, interval: float = SYS_SAMPLE_INTERVAL):
+    """
+    后台定期采样系统资源，结果写入 state.sys_snapshot
+
+    Args:
+        state: 应用状态对象
+        interval: 采样间隔（秒）
+    """
+    while True:
+        await asyncio.sleep(interval)
+        state.sys_snapshot = sample_system()
+
 @router.get(
     "/metrics",
     summary="获取服务指标",
@@ -88,32 +152,20 @@ async def get_health():
         200: {"description": "返回服务指标"}
     }
 )
-async def get_metrics():
+async def get_metrics(request: Request):
     """
     获取RAG服务的性能指标
     """
-    global total_docs, today_updates, success_rate, avg_response
+    current = request.app.state.health.metrics()
 
     # 更新历史数据
-    current_time = datetime.now().isoformat()
-    metrics_history["total_docs"].append({"time": current_time, "value": total_docs})
-    metrics_history["today_updates"].append({"time": current_time, "value": today_updates})
-    metrics_history["success_rate"].append({"time": current_time, "value": success_rate})
-    metrics_history["avg_response"].append({"time": current_time, "value": avg_response})
-
-    # 只保留最近100个数据点
-    for key in metrics_history:
-        if len(metrics_history[key]) > 100:
-            metrics_history[key] = metrics_history[key][-100:]
+    current_time = datetime.now()
+    for key, value in current.items():
+        metrics_history[key].append({"time": current_time, "value": value})
 
     return {
-        "current": {
-            "total_docs": total_docs,
-            "today_updates": today_updates,
-            "success_rate": success_rate,
-            "avg_response": avg_response
-        },
-        "history": metrics_history
+        "current": current,
+        "history": {key: list(points) for key, points in metrics_history.items()}
     }
 
 @router.get(
@@ -123,62 +175,111 @@ async def get_metrics():
         200: {"description": "返回各服务状态"}
     }
 )
-async def get_services_status():
+async def get_services_status(response: Response):
     """
     获取各个依赖服务的状态
     """
-    return await check_services()
+    response.headers["Cache-Control"] = f"max-age={int(SERVICES_CACHE_TTL)}"
+    return await cached_check_services()
 
-async def check_services() -> Dict[str, Any]:
+async def cached_check_services(ttl: float = SERVICES_CACHE_TTL) -> Dict[str, Any]:
     """
-    检查各个依赖服务的状态
+    获取依赖服务状态，ttl内复用上一次的检查结果，并发请求只触发一次检查
+
+    Args:
+        ttl: 缓存有效期（秒）
 
     Returns:
         服务状态字典
     """
-    services = {}
+    if _services_cache["value"] is not None and time.monotonic() - _services_cache["at"] < ttl:
+        return _services_cache["value"]
+
+    async with _services_lock:
+        # 等锁期间其他请求可能已经刷新了缓存
+        if _services_cache["value"] is not None and time.monotonic() - _services_cache["at"] < ttl:
+            return _services_cache["value"]
+
+        _services_cache["value"] = await check_services()
+        _services_cache["at"] = time.monotonic()
 
-    # 检查向量服务
+    return _services_cache["value"]
+
+async def _check_vector() -> Dict[str, Any]:
+    """检查向量服务"""
     try:
+        t0 = time.perf_counter()
         vector_service = get_vector_service()
         # 简单查询测试
         await vector_service.search("test", top_k=1)
-        services["vector"] = {
+        return {
             "status": "ok",
-            "latency": 10  # 模拟延迟
+            "latency": (time.perf_counter() - t0) * 1000
         }
     except Exception as e:
-        services["vector"] = {
+        return {
             "status": "error",
             "error": str(e)
         }
 
-    # 检查Elasticsearch
+async def _check_es(retriever: HybridRetriever) -> Dict[str, Any]:
+    """检查Elasticsearch"""
     try:
-        retriever = HybridRetriever()
+        t0 = time.perf_counter()
         await retriever.es.info()
-        services["elasticsearch"] = {
+        return {
             "status": "ok",
-            "latency": 15  # 模拟延迟
+            "latency": (time.perf_counter() - t0) * 1000
         }
     except Exception as e:
-        services["elasticsearch"] = {
+        return {
             "status": "error",
             "error": str(e)
         }
 
-    # 检查Redis
+async def _check_redis(retriever: HybridRetriever) -> Dict[str, Any]:
+    """检查Redis"""
     try:
-        retriever = HybridRetriever()
+        t0 = time.perf_counter()
         await retriever.redis.ping()
-        services["redis"] = {
+        return {
             "status": "ok",
-            "latency": 5  # 模拟延迟
+            "latency": (time.perf_counter() - t0) * 1000
         }
     except Exception as e:
-        services["redis"] = {
+        return {
             "status": "error",
             "error": str(e)
         }
 
-    return services
\ No newline at end of file
+async def check_services() -> Dict[str, Any]:
+    """
+    并行检查各个依赖服务的状态，单项检查超时后标记为timeout
+
+    Returns:
+        服务状态字典
+    """
+    # ES和Redis检查共用检索器单例的连接
+    retriever = await get_retriever()
+
+    names = ("vector", "elasticsearch", "redis")
+    checks = (_check_vector(), _check_es(retriever), _check_redis(retriever))
+
+    results = await asyncio.gather(
+        *(asyncio.wait_for(check, timeout=CHECK_TIMEOUT) for check in checks),
+        return_exceptions=True
+    )
+
+    services = {}
+    for name, result in zip(names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            services[name] = {"status": "timeout"}
+        elif isinstance(result, Exception):
+            services[name] = {
+                "status": "error",
+                "error": str(result)
+            }
+        else:
+            services[name] = result
+
+    return services
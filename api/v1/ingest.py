@@ -1,12 +1,16 @@
-from fastapi import APIRouter, UploadFile, File, Form, Body, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, Body, HTTPException, BackgroundTasks, Request
 from typing import List, Dict, Any, Optional
+import asyncio
+import codecs
 import time
 import json
 import uuid
+from concurrent.futures import Executor
 from datetime import datetime
 
 from services.document_processor import DocumentProcessor
-from services.vector import VectorService, get_vector_service
+from services.vector import VectorService, get_vector_service, point_id
+from services.embedding_batcher import get_embedding_batcher
 from models.document import DocumentUploadRequest, DocumentMetadata
 
 router = APIRouter(prefix="/v1/ingest", tags=["Document Ingestion"])
@@ -14,8 +18,35 @@ router = APIRouter(prefix="/v1/ingest", tags=["Document Ingestion"])
 # 初始化服务
 processor = DocumentProcessor()
 vector_service = get_vector_service()
+batcher = get_embedding_batcher()
 
-async def process_document(content: str, file_type: str, metadata: Dict[str, Any]):
+# 上传文件分块读取大小
+UPLOAD_READ_SIZE = 1 << 20
+
+async def read_upload_text(file: UploadFile) -> str:
+    """
+    分块读取上传文件并增量解码为文本，避免同时持有完整字节串和解码后的字符串
+
+    Args:
+        file: 上传文件
+
+    Returns:
+        文件文本内容
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts = []
+
+    while True:
+        data = await file.read(UPLOAD_READ_SIZE)
+        if not data:
+            break
+        parts.append(decoder.decode(data))
+
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+async def process_document(content: str, file_type: str, metadata: Dict[str, Any],
+                           executor: Optional[Executor] = None):
     """
     后台处理文档
 
@@ -23,27 +54,39 @@ async def process_document(content: str, file_type: str, metadata: Dict[str, Any
         content: 文档内容
         file_type: 文件类型
         metadata: 元数据
+        executor: 执行CPU密集型分块处理的进程池，为空时使用默认线程池
     """
-    # 处理文档
-    chunks = processor.process(content, file_type, metadata)
-
-    # 提取文本和元数据
-    texts = [chunk["content"] for chunk in chunks]
-    metadatas = [chunk["metadata"] for chunk in chunks]
-
-    # 生成向量
-    vectors = await vector_service.encode_async(texts)
-
-    # 存储向量
+    # 在进程池中分块处理文档，避免阻塞事件循环
+    loop = asyncio.get_running_loop()
+    columns = await loop.run_in_executor(executor, processor.process_columns, content, file_type, metadata)
+    texts = columns["texts"]
+    shared_metadata = columns["metadata"]
+
+    # 生成向量（与并发上传的其他文档合并批量编码）
+    vectors = await asyncio.gather(*[batcher.submit(text) for text in texts])
+
+    # 存储向量，共享元数据与逐块字段直接合并为载荷
+    payloads = [{
+        "content": text,
+        **shared_metadata,
+        "chunk_id": chunk_id,
+        "chunk_index": chunk_index,
+        "semantic_tag": semantic_tag,
+        "content_hash": content_hash
+    } for text, chunk_id, chunk_index, semantic_tag, content_hash in zip(
+        texts, columns["chunk_ids"], columns["chunk_indices"],
+        columns["semantic_tags"], columns["content_hashes"]
+    )]
+
+    # 点ID限定在文档范围内，不同上传中的相同块不会互相覆盖
+    doc_id = shared_metadata.get("doc_id", "")
     await vector_service.upsert(
         vectors=vectors,
-        payloads=[{
-            "content": text,
-            **metadata
-        } for text, metadata in zip(texts, metadatas)]
+        payloads=payloads,
+        ids=[point_id(payload, scope=doc_id) for payload in payloads]
     )
 
-    print(f"文档处理完成，共 {len(chunks)} 个块")
+    print(f"文档处理完成，共 {len(texts)} 个块")
 
 @router.post(
     "/upload",
@@ -55,6 +98,7 @@ async def process_document(content: str, file_type: str, metadata: Dict[str, Any
     }
 )
 async def upload_document(
+    http_request: Request,
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     title: str = Form(...),
@@ -75,7 +119,7 @@ async def upload_document(
     """
     try:
         # 读取文件内容
-        content = await file.read()
+        content = await read_upload_text(file)
 
         # 解析文件类型
         file_type = file.filename.split(".")[-1] if "." in file.filename else "txt"
@@ -87,7 +131,7 @@ async def upload_document(
             "file_name": file.filename,
             "file_type": file_type,
             "processed_at": datetime.now().isoformat(),
-            "doc_id": str(uuid.uuid4())
+            "doc_id": uuid.uuid4().hex
         }
 
         if source_id:
@@ -102,9 +146,10 @@ async def upload_document(
         # 添加后台任务
         background_tasks.add_task(
             process_document,
-            content.decode("utf-8", errors="ignore"),
+            content,
             file_type,
-            metadata
+            metadata,
+            http_request.app.state.cpu_pool
         )
 
         return {
@@ -127,6 +172,7 @@ async def upload_document(
     }
 )
 async def upload_text(
+    http_request: Request,
     background_tasks: BackgroundTasks,
     request: DocumentUploadRequest = Body(...)
 ):
@@ -146,7 +192,7 @@ async def upload_text(
             "title": request.title,
             "source_type": request.source_type,
             "processed_at": datetime.now().isoformat(),
-            "doc_id": str(uuid.uuid4())
+            "doc_id": uuid.uuid4().hex
         })
 
         if request.source_id:
@@ -157,7 +203,8 @@ async def upload_text(
             process_document,
             request.content,
             "txt",
-            metadata
+            metadata,
+            http_request.app.state.cpu_pool
         )
 
         return {
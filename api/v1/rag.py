@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Body, Depends, HTTPException
 from pydantic import BaseModel
+import asyncio
 import time
 from typing import List, Dict, Any, Optional
 
@@ -8,11 +9,22 @@ from models.document import RAGRequest, RAGResponse
 
 router = APIRouter(prefix="/v1/rag", tags=["RAG Service"])
 
+# 检索器单例，所有请求复用同一组ES/Redis连接
+_retriever: Optional[HybridRetriever] = None
+_retriever_lock = asyncio.Lock()
+
 async def get_retriever() -> HybridRetriever:
-    """获取检索器实例"""
-    retriever = HybridRetriever()
-    await retriever.initialize()
-    return retriever
+    """获取检索器单例，首次调用时创建并初始化"""
+    global _retriever
+
+    if _retriever is None:
+        async with _retriever_lock:
+            if _retriever is None:
+                retriever = HybridRetriever()
+                await retriever.initialize()
+                _retriever = retriever
+
+    return _retriever
 
 @router.post(
     "/query",
@@ -38,7 +50,7 @@ async def rag_query(
     - **filters**: 可选的过滤条件
     """
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         # 应用过滤器
         filters = request.filters or {}
@@ -52,7 +64,7 @@ async def rag_query(
 
         return RAGResponse(
             results=results,
-            latency=time.time() - start_time,
+            latency=time.perf_counter() - start_time,
             search_method="hybrid"
         )
     except Exception as e:
@@ -71,8 +83,8 @@ async def health_check():
     检查RAG服务的健康状态
     """
     try:
-        # 创建检索器实例
-        retriever = HybridRetriever()
+        # 获取检索器实例
+        retriever = await get_retriever()
 
         # 检查向量服务
         vector_status = "ok"
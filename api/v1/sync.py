@@ -1,18 +1,21 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends, BackgroundTasks
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional, Set
 import asyncio
 import time
-import json
+import orjson
 from datetime import datetime
 
 router = APIRouter(prefix="/v1/sync", tags=["Document Synchronization"])
 
 # 存储活跃的WebSocket连接
-active_connections: List[WebSocket] = []
+active_connections: Set[WebSocket] = set()
 
 # 同步状态存储
 sync_status = {}
 
+# 单个连接发送状态的超时时间（秒）
+SEND_TIMEOUT = 2.0
+
 async def broadcast_status(source_id: str, status: Dict[str, Any]):
     """
     广播同步状态更新
@@ -24,15 +27,30 @@ async def broadcast_status(source_id: str, status: Dict[str, Any]):
     # 更新状态存储
     sync_status[source_id] = status
 
-    # 广播给所有连接
-    for connection in active_connections:
-        try:
-            await connection.send_json({
-                "source_id": source_id,
-                **status
-            })
-        except Exception:
-            pass
+    # 只序列化一次，并发广播给所有连接，单个慢连接不会阻塞其他连接
+    message = orjson.dumps({
+        "source_id": source_id,
+        **status
+    }).decode()
+    connections = list(active_connections)
+    results = await asyncio.gather(
+        *(asyncio.wait_for(connection.send_text(message), timeout=SEND_TIMEOUT) for connection in connections),
+        return_exceptions=True
+    )
+
+    # 移除发送失败或超时的连接，并关闭连接让客户端感知断开后重连
+    failed = [connection for connection, result in zip(connections, results) if isinstance(result, Exception)]
+    for connection in failed:
+        active_connections.discard(connection)
+    if failed:
+        await asyncio.gather(*(_close_quietly(connection) for connection in failed))
+
+async def _close_quietly(connection: WebSocket):
+    """尽力关闭连接，忽略连接已断开等错误"""
+    try:
+        await asyncio.wait_for(connection.close(), timeout=SEND_TIMEOUT)
+    except Exception:
+        pass
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -40,34 +58,34 @@ async def websocket_endpoint(websocket: WebSocket):
     WebSocket端点，用于实时同步状态更新
     """
     await websocket.accept()
-    active_connections.append(websocket)
+    active_connections.add(websocket)
 
     try:
         # 发送当前状态
-        await websocket.send_json({
+        await websocket.send_text(orjson.dumps({
             "type": "initial_status",
             "status": sync_status
-        })
+        }).decode())
 
         # 保持连接
         while True:
             data = await websocket.receive_text()
             # 可以处理客户端消息，例如请求特定源的状态
             try:
-                msg = json.loads(data)
+                msg = orjson.loads(data)
                 if msg.get("action") == "get_status" and "source_id" in msg:
                     source_id = msg["source_id"]
                     if source_id in sync_status:
-                        await websocket.send_json({
+                        await websocket.send_text(orjson.dumps({
                             "type": "status_update",
                             "source_id": source_id,
                             **sync_status[source_id]
-                        })
+                        }).decode())
             except:
                 pass
 
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        active_connections.discard(websocket)
 
 @router.post(
     "/start/{source_id}",
@@ -94,7 +112,7 @@ async def start_sync(
     await broadcast_status(source_id, {
         "status": "processing",
         "progress": 0,
-        "started_at": datetime.now().isoformat(),
+        "started_at": datetime.now(),
         "message": "同步任务已启动"
     })
 
@@ -159,7 +177,7 @@ async def simulate_sync_process(source_id: str):
             "status": "processing" if progress < 100 else "completed",
             "progress": progress,
             "message": f"同步进度: {progress}%" if progress < 100 else "同步完成",
-            "updated_at": datetime.now().isoformat()
+            "updated_at": datetime.now()
         })
 
         # 模拟处理时间
@@ -170,5 +188,5 @@ async def simulate_sync_process(source_id: str):
         "status": "completed",
         "progress": 100,
         "message": "同步完成",
-        "completed_at": datetime.now().isoformat()
+        "completed_at": datetime.now()
     })
\ No newline at end of file
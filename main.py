@@ -1,18 +1,64 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, Response
+import asyncio
 import time
 import os
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import uvicorn
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from brotli_asgi import BrotliMiddleware
 
 # 加载环境变量
 load_dotenv()
 
 # 导入API路由
 from api.v1 import api_router
+from api.v1.rag import get_retriever
+from api.v1.health import HealthState, sample_system, run_system_sampler
+from services.embedding_batcher import get_embedding_batcher
+from services.vector import get_vector_service
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时预热共享资源，关闭时释放连接"""
+    # 预热检索器单例，避免首个请求承担初始化开销
+    retriever = await get_retriever()
+
+    # 启动嵌入请求合并任务
+    batcher = get_embedding_batcher()
+    batcher.start()
+
+    # 文档分块等CPU密集型任务使用进程池执行，绕开GIL；此时模型和后台线程已启动，
+    # 使用forkserver启动子进程，避免fork持有线程和模型的进程
+    app.state.cpu_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context("forkserver")
+    )
+
+    # 首页在启动时读入内存，请求时不再读磁盘
+    with open("static/index.html", "rb") as f:
+        app.state.index_html = f.read()
+
+    # 健康指标状态
+    app.state.health = HealthState()
+
+    # 系统资源在后台定期采样，健康检查接口直接读取快照
+    app.state.sys_snapshot = sample_system()
+    sampler = asyncio.create_task(run_system_sampler(app.state))
+
+    yield
+
+    sampler.cancel()
+    app.state.cpu_pool.shutdown()
+    await batcher.stop()
+    await get_vector_service().close()
+    await retriever.close()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -20,7 +66,9 @@ app = FastAPI(
     description="基于混合检索技术的企业级RAG（检索增强生成）服务",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -32,6 +80,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩：支持br的客户端使用Brotli，其余回退到gzip
+app.add_middleware(BrotliMiddleware, quality=4, minimum_size=1024, gzip_fallback=True)
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -39,10 +90,24 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 REQUEST_COUNT = Counter("http_requests_total", "Total HTTP Requests", ["method", "endpoint", "status"])
 REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP Request Latency", ["method", "endpoint"])
 
+# 缓存带标签的子指标，避免每个请求都执行labels()查找
+@lru_cache(maxsize=4096)
+def _request_count(method: str, endpoint: str, status: int):
+    return REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status)
+
+@lru_cache(maxsize=4096)
+def _request_latency(method: str, endpoint: str):
+    return REQUEST_LATENCY.labels(method=method, endpoint=endpoint)
+
+def _endpoint_label(request: Request) -> str:
+    """使用路由模板作为endpoint标签（如 /v1/sync/status/{source_id}），避免标签基数随URL无限增长"""
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
 @app.middleware("http")
 async def metrics_middleware(request: Request, call_next):
     """收集请求指标的中间件"""
-    start_time = time.time()
+    start_time = time.perf_counter()
 
     # 处理请求
     try:
@@ -53,11 +118,11 @@ async def metrics_middleware(request: Request, call_next):
         raise e
     finally:
         # 记录指标
-        endpoint = request.url.path
+        endpoint = _endpoint_label(request)
         method = request.method
 
-        REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status_code).inc()
-        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(time.time() - start_time)
+        _request_count(method, endpoint, status_code).inc()
+        _request_latency(method, endpoint).observe(time.perf_counter() - start_time)
 
     return response
 
@@ -71,11 +136,9 @@ app.include_router(api_router)
 
 # 首页路由
 @app.get("/", response_class=HTMLResponse)
-async def index():
+async def index(request: Request):
     """返回前端HTML页面"""
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        html_content = f.read()
-    return html_content
+    return HTMLResponse(content=request.app.state.index_html)
 
 @app.get("/health")
 async def health_check():
@@ -17,7 +17,7 @@ class DocumentMetadata(BaseModel):
 
 class DocumentChunk(BaseModel):
     """文档块模型"""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     content: str
     metadata: DocumentMetadata = Field(default_factory=DocumentMetadata)
     chunk_index: Optional[int] = None
@@ -27,7 +27,7 @@ class DocumentChunk(BaseModel):
 
 class Document(BaseModel):
     """完整文档模型"""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     title: str
     content: str
     metadata: DocumentMetadata = Field(default_factory=DocumentMetadata)
@@ -37,7 +37,7 @@ class Document(BaseModel):
 
 class DocumentSource(BaseModel):
     """文档源模型"""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     name: str
     source_type: str  # 例如：file, web, github, feishu等
     config: Dict[str, Any] = Field(default_factory=dict)
@@ -0,0 +1,38 @@
+import argparse
+import os
+
+def main():
+    """将向量模型导出为ONNX并进行int8动态量化"""
+    parser = argparse.ArgumentParser(description="导出ONNX int8向量模型")
+    parser.add_argument("--model", default="BAAI/bge-large-zh-v1.5", help="向量模型名称")
+    parser.add_argument("--output", default="bge-int8", help="量化模型输出目录")
+    args = parser.parse_args()
+
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+    except ImportError:
+        print("未安装optimum，无法导出ONNX模型")
+        print("提示: 您可以安装optimum: pip install optimum[onnxruntime]")
+        return
+
+    onnx_dir = f"{args.output}-fp32"
+
+    print(f"正在导出ONNX模型: {args.model}")
+    model = ORTModelForFeatureExtraction.from_pretrained(args.model, export=True)
+    model.save_pretrained(onnx_dir)
+    AutoTokenizer.from_pretrained(args.model).save_pretrained(onnx_dir)
+
+    # 动态量化无需校准数据，权重量化为int8，可使用VNNI指令加速
+    print("正在进行int8动态量化...")
+    quantizer = ORTQuantizer.from_pretrained(onnx_dir)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=args.output, quantization_config=qconfig)
+    AutoTokenizer.from_pretrained(onnx_dir).save_pretrained(args.output)
+
+    print(f"量化模型已生成: {os.path.abspath(args.output)}")
+    print(f"提示: 设置 ENCODER_ONNX_PATH={args.output} 启用ONNX编码")
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,27 @@ import os
 import uuid
 from datetime import datetime
 import hashlib
+import re
+
+# 语义标签规则，按优先级从高到低排列
+SEMANTIC_TAG_RULES = [
+    ("code", ["```", "代码", "function", "class"]),
+    ("procedure", ["步骤", "操作", "1.", "2."]),
+    ("warning", ["注意", "警告", "!"]),
+    ("data", ["表格", "数据", "|"]),
+]
+
+# 关键词 -> 规则优先级
+_TAG_PRIORITY = {
+    keyword: priority
+    for priority, (_, keywords) in enumerate(SEMANTIC_TAG_RULES)
+    for keyword in keywords
+}
+
+# 所有关键词编译为一个正则，单次扫描文本即可找出全部命中
+_TAG_PATTERN = re.compile(
+    "|".join(re.escape(keyword) for keyword in sorted(_TAG_PRIORITY, key=len, reverse=True))
+)
 
 class DocumentProcessor:
     """文档处理服务，负责文档的分块和处理"""
@@ -30,26 +51,21 @@ class DocumentProcessor:
         Returns:
             处理后的文档块列表
         """
-        # 使用简单的文本分块策略
-        chunks = self._split_text(content)
-
-        # 生成基础元数据
-        base_metadata = metadata or {}
-        base_metadata.update({
-            "file_type": file_type,
-            "processed_at": datetime.now().isoformat(),
-            "processor_version": "1.0.0"
-        })
+        columns = self.process_columns(content, file_type, metadata)
+        base_metadata = columns["metadata"]
 
         # 为每个块添加元数据
         result = []
-        for i, chunk in enumerate(chunks):
+        for chunk, chunk_id, chunk_index, semantic_tag, content_hash in zip(
+            columns["texts"], columns["chunk_ids"], columns["chunk_indices"],
+            columns["semantic_tags"], columns["content_hashes"]
+        ):
             chunk_metadata = base_metadata.copy()
             chunk_metadata.update({
-                "chunk_id": str(uuid.uuid4()),
-                "chunk_index": i,
-                "semantic_tag": self._detect_semantic_tag(chunk),
-                "content_hash": self._hash_content(chunk)
+                "chunk_id": chunk_id,
+                "chunk_index": chunk_index,
+                "semantic_tag": semantic_tag,
+                "content_hash": content_hash
             })
 
             result.append({
@@ -59,6 +75,42 @@ class DocumentProcessor:
 
         return result
 
+    def process_columns(self, content: str, file_type: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        处理文档内容，按列返回结果
+
+        所有块共享的元数据只保存一份，逐块变化的字段以等长的并行列表返回，
+        调用方构造存储载荷时无需为每个块复制元数据
+
+        Args:
+            content: 文档内容
+            file_type: 文件类型
+            metadata: 元数据
+
+        Returns:
+            包含 metadata（共享元数据）以及 texts、chunk_ids、chunk_indices、
+            semantic_tags、content_hashes 并行列表的字典
+        """
+        # 使用简单的文本分块策略
+        chunks = self._split_text(content)
+
+        # 生成基础元数据
+        base_metadata = metadata or {}
+        base_metadata.update({
+            "file_type": file_type,
+            "processed_at": datetime.now().isoformat(),
+            "processor_version": "1.0.0"
+        })
+
+        return {
+            "metadata": base_metadata,
+            "texts": chunks,
+            "chunk_ids": [uuid.uuid4().hex for _ in chunks],
+            "chunk_indices": list(range(len(chunks))),
+            "semantic_tags": [self._detect_semantic_tag(chunk) for chunk in chunks],
+            "content_hashes": [self._hash_content(chunk) for chunk in chunks]
+        }
+
     def _split_text(self, text: str) -> List[str]:
         """
         将文本分割成块
@@ -69,35 +121,29 @@ class DocumentProcessor:
         Returns:
             文本块列表
         """
-        # 使用简单的分段策略
+        # 使用简单的分段策略，分块时直接拼接上一块末尾的重叠内容
         paragraphs = text.split("\n\n")
         chunks = []
-        current_chunk = ""
+        parts: List[str] = []
+        size = 0
+        overlap = ""
 
         for para in paragraphs:
-            if len(current_chunk) + len(para) <= self.chunk_size:
-                current_chunk += para + "\n\n"
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = para + "\n\n"
-
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-
-        # 处理重叠
-        if self.chunk_overlap > 0 and len(chunks) > 1:
-            overlapped_chunks = []
-            for i in range(len(chunks)):
-                if i == 0:
-                    overlapped_chunks.append(chunks[i])
-                else:
-                    # 从前一个块的末尾获取重叠内容
-                    prev_chunk = chunks[i-1]
-                    overlap_content = prev_chunk[-self.chunk_overlap:] if len(prev_chunk) > self.chunk_overlap else prev_chunk
-                    overlapped_chunks.append(overlap_content + chunks[i])
-
-            chunks = overlapped_chunks
+            if parts and size + len(para) > self.chunk_size:
+                chunk = "".join(parts).strip()
+                chunks.append(overlap + chunk)
+                # 重叠内容取自上一块的原始文本（不含其自身的重叠前缀）
+                if self.chunk_overlap > 0:
+                    overlap = chunk[-self.chunk_overlap:]
+                parts = []
+                size = 0
+
+            parts.append(para)
+            parts.append("\n\n")
+            size += len(para) + 2
+
+        if parts:
+            chunks.append(overlap + "".join(parts).strip())
 
         return chunks
 
@@ -111,17 +157,18 @@ class DocumentProcessor:
         Returns:
             语义标签
         """
-        # 简单的规则匹配
-        if "```" in text or "代码" in text or "function" in text or "class" in text:
-            return "code"
-        elif "步骤" in text or "操作" in text or "1." in text or "2." in text:
-            return "procedure"
-        elif "注意" in text or "警告" in text or "!" in text:
-            return "warning"
-        elif "表格" in text or "数据" in text or "|" in text:
-            return "data"
-        else:
-            return "general"
+        # 单次扫描，取命中关键词中优先级最高的规则
+        best = len(SEMANTIC_TAG_RULES)
+        for match in _TAG_PATTERN.finditer(text):
+            priority = _TAG_PRIORITY[match.group()]
+            if priority < best:
+                best = priority
+                if best == 0:
+                    break
+
+        if best < len(SEMANTIC_TAG_RULES):
+            return SEMANTIC_TAG_RULES[best][0]
+        return "general"
 
     def _hash_content(self, content: str) -> str:
         """
@@ -133,4 +180,5 @@ class DocumentProcessor:
         Returns:
             哈希值
         """
-        return hashlib.md5(content.encode()).hexdigest()
\ No newline at end of file
+        # 仅用作内容指纹，blake2b比md5更快，16字节摘要保持与原先相同的长度
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
\ No newline at end of file
@@ -0,0 +1,109 @@
+from typing import List, Tuple, Callable, Awaitable, Optional
+import asyncio
+import os
+from functools import lru_cache
+
+class EmbeddingBatcher:
+    """嵌入请求合并器，将短时间窗口内到达的编码请求合并为一次批量编码"""
+
+    def __init__(self, encode: Callable[[List[str]], Awaitable[List[List[float]]]],
+                 max_size: int = 64, max_wait: float = 0.02):
+        """
+        初始化嵌入请求合并器
+
+        Args:
+            encode: 批量编码协程函数
+            max_size: 单批最大文本数
+            max_wait: 收集一批文本的最长等待时间（秒）
+        """
+        self.encode = encode
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue[Tuple[str, asyncio.Future]] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """启动后台合并任务（已启动时忽略）"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台合并任务"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, text: str) -> List[float]:
+        """
+        提交单条文本，等待所在批次编码完成
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            文本向量
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """收集一批待编码文本，达到批大小或等待超时即返回"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """后台合并循环"""
+        while True:
+            batch = await self._collect()
+            # 调用方已取消的请求（如缓存命中后取消的预检索）无需编码
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            try:
+                vectors = await self.encode([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+@lru_cache(maxsize=1)
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """
+    获取嵌入请求合并器单例
+
+    批大小和等待窗口可通过环境变量 BATCH_MAX_SIZE、BATCH_MAX_WAIT_MS 调整
+
+    Returns:
+        嵌入请求合并器实例
+    """
+    from .vector import get_vector_service
+
+    return EmbeddingBatcher(
+        get_vector_service().encode_async,
+        max_size=int(os.getenv("BATCH_MAX_SIZE", "64")),
+        max_wait=float(os.getenv("BATCH_MAX_WAIT_MS", "20")) / 1000
+    )
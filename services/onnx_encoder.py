@@ -0,0 +1,81 @@
+from typing import List
+import os
+import numpy as np
+
+class OnnxEncoder:
+    """基于ONNX Runtime的文本编码器，加载导出并int8量化后的模型，接口与SentenceTransformer一致"""
+
+    def __init__(self, model_path: str, pooling: str = "cls", max_length: int = 512):
+        """
+        初始化ONNX编码器
+
+        Args:
+            model_path: 导出的ONNX模型目录（含分词器文件）
+            pooling: 池化方式，cls或mean（BGE系列模型使用cls）
+            max_length: 最大输入长度
+        """
+        # 仅在启用ONNX编码时需要optimum[onnxruntime]
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        if pooling not in ("cls", "mean"):
+            raise ValueError(f"不支持的池化方式: {pooling}")
+
+        # 量化工具输出的文件名为model_quantized.onnx
+        file_name = "model_quantized.onnx"
+        if not os.path.exists(os.path.join(model_path, file_name)):
+            file_name = "model.onnx"
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_path,
+            file_name=file_name,
+            provider="CPUExecutionProvider"
+        )
+        self.pooling = pooling
+        self.max_length = max_length
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """获取向量维度"""
+        return self.model.config.hidden_size
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        将文本编码为归一化向量
+
+        按batch_size分批推理，与SentenceTransformer一致，避免整个输入列表填充为一个大张量
+
+        Args:
+            texts: 文本列表
+            batch_size: 单次推理的文本数
+
+        Returns:
+            向量矩阵
+        """
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        return np.concatenate([
+            self._encode_batch(texts[start:start + batch_size])
+            for start in range(0, len(texts), batch_size)
+        ])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """编码一批文本：分词、推理、池化并L2归一化"""
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        hidden = self.model(**inputs).last_hidden_state
+
+        if self.pooling == "cls":
+            embeddings = hidden[:, 0]
+        else:
+            mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+            embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-12, None)
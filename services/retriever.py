@@ -1,15 +1,85 @@
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Set, Tuple
 import asyncio
 import time
 import numpy as np
-from rank_bm25 import BM25Okapi
-from elasticsearch import AsyncElasticsearch
+import bm25s
+from elasticsearch import AsyncElasticsearch, NotFoundError
 import redis.asyncio as aioredis
-import json
+import orjson
 import os
+import heapq
+from collections import defaultdict
+from functools import lru_cache
+from cachetools import TTLCache
 
 from .vector import VectorService, get_vector_service
 
+# RRF公式: 1 / (k + rank)中的常数k，通常取60
+RRF_K = 60.0
+
+# 文档频率超过语料该比例的词项视为停用词，查询时忽略
+BM25_STOPWORD_DF_RATIO = 0.02
+# 小语料下比例阈值过低，停用词至少需出现在这么多文档中
+BM25_STOPWORD_MIN_DF = 10
+
+# 索引不存在的探测结果缓存秒数，过期后重新探测，以便发现新建的索引
+ES_INDEX_MISSING_TTL = 30.0
+
+@lru_cache(maxsize=64)
+def _rrf_weights(n: int) -> Tuple[float, ...]:
+    """
+    获取前n个排名的RRF权重，按候选数量缓存，避免逐项重复计算
+
+    Args:
+        n: 候选数量
+
+    Returns:
+        各排名的权重
+    """
+    return tuple(1.0 / (RRF_K + rank) for rank in range(n))
+
+@lru_cache(maxsize=None)
+def get_elasticsearch(host: str, port: int) -> AsyncElasticsearch:
+    """
+    获取进程内共享的Elasticsearch客户端，所有检索器复用同一连接池
+
+    Args:
+        host: Elasticsearch主机
+        port: Elasticsearch端口
+
+    Returns:
+        Elasticsearch客户端实例
+    """
+    return AsyncElasticsearch(
+        f"http://{host}:{port}",
+        # 初始化加载与并发查询共用连接，默认每节点10个连接不够用
+        connections_per_node=64,
+        # 压缩请求和响应体，检索结果的文本内容压缩率高
+        http_compress=True,
+        request_timeout=5,
+        retry_on_timeout=True,
+        max_retries=2
+    )
+
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    取得分最高的top_k个下标（按得分降序）
+
+    只对前top_k个元素排序，复杂度为 O(N + k log k)
+
+    Args:
+        scores: 得分数组
+        top_k: 返回数量
+
+    Returns:
+        下标数组
+    """
+    if top_k >= len(scores):
+        return np.argsort(-scores)
+
+    part = np.argpartition(-scores, top_k)[:top_k]
+    return part[np.argsort(-scores[part])]
+
 class HybridRetriever:
     """混合检索服务，结合向量检索和关键词检索"""
 
@@ -25,18 +95,36 @@ class HybridRetriever:
         # 初始化Elasticsearch客户端
         self.es_host = os.getenv("ELASTICSEARCH_HOST", "localhost")
         self.es_port = int(os.getenv("ELASTICSEARCH_PORT", "9200"))
-        self.es = AsyncElasticsearch(f"http://{self.es_host}:{self.es_port}")
+        self.es = get_elasticsearch(self.es_host, self.es_port)
         self.index_name = "docs"
 
+        # 索引是否存在，初始化时探测一次，查询时不再逐次请求ES；
+        # 不存在的结果只缓存ES_INDEX_MISSING_TTL秒
+        self._es_index_ready: Optional[bool] = None
+        self._es_index_checked_at = 0.0
+
         # 初始化Redis客户端
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
         self.redis_port = int(os.getenv("REDIS_PORT", "6379"))
-        self.redis = aioredis.Redis(host=self.redis_host, port=self.redis_port, decode_responses=True)
+        # 缓存值为orjson序列化的字节串，直接交给orjson.loads解析，无需先解码为str
+        self.redis = aioredis.Redis(host=self.redis_host, port=self.redis_port)
+
+        # 进程内查询缓存，位于Redis缓存之前，热点查询无需网络往返
+        self._local_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+
+        # 后台任务（如缓存写入）引用，避免任务未完成即被回收
+        self._background_tasks: Set[asyncio.Task] = set()
 
         # BM25初始化标志
         self.bm25_initialized = False
         self.documents = []
         self.bm25 = None
+        # 词项 -> (文档ID数组 int32, 预计算得分数组 float32)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # 高文档频率词项，查询时忽略
+        self._stopwords: Set[str] = set()
+        # 查询分词结果缓存，重建索引时清空
+        self._tokenize_query = lru_cache(maxsize=2048)(self._tokenize_query_uncached)
 
     async def initialize(self):
         """初始化检索器，加载必要的数据"""
@@ -46,11 +134,33 @@ class HybridRetriever:
         except Exception as e:
             print(f"BM25初始化错误: {e}")
 
+        await self.warmup()
+
+    async def warmup(self):
+        """
+        预热检索链路：执行一次向量检索和BM25检索，使模型权重、推理内核和Qdrant索引缓存
+        在启动时就绪，避免首个查询承担加载开销
+        """
+        start_time = time.perf_counter()
+        # 向量检索内部已捕获异常，后端不可用时不影响启动
+        await self._vector_search("warmup", 1)
+        self._bm25_search("warmup", 1)
+        print(f"检索链路预热完成，耗时 {time.perf_counter() - start_time:.2f}s")
+
+    async def close(self):
+        """等待后台缓存写入完成，并关闭Elasticsearch和Redis连接"""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self.es.close()
+        # 共享客户端已关闭，之后创建的检索器需要新建客户端
+        get_elasticsearch.cache_clear()
+        await self.redis.close()
+
     async def _init_bm25(self):
         """从Elasticsearch加载文档初始化BM25"""
         try:
-            # 检查索引是否存在
-            if not await self.es.indices.exists(index=self.index_name):
+            # 检查索引是否存在，结果供后续查询复用
+            if not await self._probe_es_index():
                 print(f"索引 {self.index_name} 不存在，跳过BM25初始化")
                 return
 
@@ -81,9 +191,11 @@ class HybridRetriever:
                     })
                     texts.append(content)
 
-            # 初始化BM25
-            tokenized_texts = [doc.split() for doc in texts]
-            self.bm25 = BM25Okapi(tokenized_texts)
+            # 初始化BM25，索引时预先计算词项得分并以稀疏矩阵存储
+            corpus_tokens = bm25s.tokenize(texts, stopwords="en", show_progress=False)
+            self.bm25 = bm25s.BM25()
+            self.bm25.index(corpus_tokens, show_progress=False)
+            self._build_postings()
             self.bm25_initialized = True
 
             print(f"BM25初始化完成，加载了 {len(self.documents)} 个文档")
@@ -91,6 +203,73 @@ class HybridRetriever:
             print(f"BM25初始化错误: {e}")
             self.bm25_initialized = False
 
+    def _build_postings(self):
+        """
+        将BM25索引整理为按词项划分的SoA倒排表
+
+        bm25s在索引时已将每个(词项, 文档)的BM25得分预计算为CSC稀疏矩阵，
+        这里直接取每列的切片视图，不复制数据
+        """
+        matrix = self.bm25.scores
+        indptr, indices, data = matrix["indptr"], matrix["indices"], matrix["data"]
+
+        self._postings = {
+            term: (
+                indices[indptr[term_id]:indptr[term_id + 1]].astype(np.int32, copy=False),
+                data[indptr[term_id]:indptr[term_id + 1]].astype(np.float32, copy=False)
+            )
+            for term, term_id in self.bm25.vocab_dict.items()
+            # 词表中的占位词项（如空字符串）没有对应的列
+            if term_id < len(indptr) - 1
+        }
+
+        # 统计文档频率，过滤几乎出现在所有文档中的词项
+        df_threshold = max(BM25_STOPWORD_DF_RATIO * len(self.documents), BM25_STOPWORD_MIN_DF)
+        self._stopwords = {
+            term for term, (doc_ids, _) in self._postings.items()
+            if len(doc_ids) > df_threshold
+        }
+        self._tokenize_query.cache_clear()
+
+    def _tokenize_query_uncached(self, query: str) -> Tuple[str, ...]:
+        """
+        查询分词并去除高文档频率词项
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            查询词项
+        """
+        tokens = bm25s.tokenize(query, stopwords="en", return_ids=False, show_progress=False)[0]
+        filtered = tuple(token for token in tokens if token not in self._stopwords)
+        # 全部是高频词时保留原词项，避免查询为空
+        return filtered or tuple(tokens)
+
+    def _bm25_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """
+        计算所有文档的BM25得分
+
+        按查询词项把倒排表中的预计算得分累加到稠密的float32数组，由NumPy向量化执行
+
+        Args:
+            query_tokens: 查询词项列表
+
+        Returns:
+            各文档得分
+        """
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+
+        for token in query_tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            doc_ids, contribs = postings
+            # 同一词项的倒排表中文档ID不重复，可以直接用花式索引累加
+            scores[doc_ids] += contribs
+
+        return scores
+
     async def retrieve(self, query: str, top_k: int = 5, use_cache: bool = True) -> List[Dict[str, Any]]:
         """
         混合检索
@@ -103,18 +282,79 @@ class HybridRetriever:
         Returns:
             检索结果列表
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
+
+        # 检查缓存：先查进程内缓存，再查Redis
+        cache_key = f"search:{query}:{top_k}"
+        if not use_cache:
+            return await self._search_with_metadata(query, top_k, start_time)
+
+        local_result = self._local_cache.get(cache_key)
+        if local_result is not None:
+            return local_result
+
+        # Redis查询与检索同时发起，缓存未命中时不额外等待一次Redis往返
+        cache_task = asyncio.create_task(self._cache_lookup(cache_key))
+        search_task = asyncio.create_task(self._search_with_metadata(query, top_k, start_time))
+
+        cached_result = await cache_task
+        if cached_result is not None:
+            search_task.cancel()
+            self._local_cache[cache_key] = cached_result
+            return cached_result
+
+        final_results = await search_task
+
+        # 缓存结果，Redis写入在后台完成，不阻塞响应
+        self._local_cache[cache_key] = final_results
+        self._spawn(self._cache_store(cache_key, final_results))
+
+        return final_results
 
-        # 检查缓存
-        if use_cache:
-            cache_key = f"search:{query}:{top_k}"
+    async def _search_with_metadata(self, query: str, top_k: int, start_time: float) -> List[Dict[str, Any]]:
+        """执行混合检索并为结果添加耗时和检索方式"""
+        final_results = await self._search(query, top_k)
+
+        for result in final_results:
+            result["latency"] = time.perf_counter() - start_time
+            result["search_method"] = "hybrid"
+
+        return final_results
+
+    async def _cache_lookup(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+        """从Redis读取缓存结果，未命中或出错时返回None"""
+        try:
             cached_result = await self.redis.get(cache_key)
             if cached_result:
-                try:
-                    return json.loads(cached_result)
-                except:
-                    pass
+                return orjson.loads(cached_result)
+        except Exception as e:
+            print(f"Redis缓存读取错误: {e}")
+        return None
 
+    async def _cache_store(self, cache_key: str, results: List[Dict[str, Any]]):
+        """将结果写入Redis缓存"""
+        try:
+            await self.redis.setex(cache_key, 3600, orjson.dumps(results))
+        except Exception as e:
+            print(f"Redis缓存写入错误: {e}")
+
+    def _spawn(self, coro):
+        """在后台运行协程，并持有任务引用直到完成"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        执行混合检索（不经过缓存）
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+
+        Returns:
+            融合后的结果列表
+        """
         # 并行执行向量检索和关键词检索
         vector_future = self._vector_search(query, top_k * 2)
         keyword_future = self._keyword_search(query, top_k * 2)
@@ -122,20 +362,7 @@ class HybridRetriever:
         vector_results, keyword_results = await asyncio.gather(vector_future, keyword_future)
 
         # 融合结果
-        combined_results = self._fuse_results(query, vector_results, keyword_results)
-        final_results = combined_results[:top_k]
-
-        # 添加元数据
-        for result in final_results:
-            result["latency"] = time.time() - start_time
-            result["search_method"] = "hybrid"
-
-        # 缓存结果
-        if use_cache:
-            cache_key = f"search:{query}:{top_k}"
-            await self.redis.setex(cache_key, 3600, json.dumps(final_results))
-
-        return final_results
+        return self._fuse_results(query, vector_results, keyword_results, top_k)
 
     async def _vector_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -177,7 +404,7 @@ class HybridRetriever:
         """
         # 尝试使用Elasticsearch
         try:
-            if await self.es.indices.exists(index=self.index_name):
+            if await self._es_index_exists():
                 result = await self.es.search(
                     index=self.index_name,
                     body={
@@ -202,15 +429,50 @@ class HybridRetriever:
                     }
                     for hit in result["hits"]["hits"]
                 ]
+        except NotFoundError:
+            # 索引已被删除，一段时间内不再请求ES
+            self._es_index_ready = False
+            self._es_index_checked_at = time.monotonic()
         except Exception as e:
             print(f"Elasticsearch检索错误: {e}")
 
         # 回退到BM25
+        return self._bm25_search(query, top_k)
+
+    async def _es_index_exists(self) -> bool:
+        """索引是否存在，未探测过或索引不存在的结果已过期时重新请求ES"""
+        if self._es_index_ready is None or (
+            not self._es_index_ready
+            and time.monotonic() - self._es_index_checked_at > ES_INDEX_MISSING_TTL
+        ):
+            return await self._probe_es_index()
+        return self._es_index_ready
+
+    async def _probe_es_index(self) -> bool:
+        """请求ES探测索引是否存在，并缓存结果"""
+        self._es_index_ready = bool(await self.es.indices.exists(index=self.index_name))
+        self._es_index_checked_at = time.monotonic()
+        return self._es_index_ready
+
+    def _bm25_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        本地BM25检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+
+        Returns:
+            检索结果列表，BM25未初始化时为空
+        """
         try:
             if self.bm25_initialized and self.bm25:
-                tokenized_query = query.split()
-                doc_scores = self.bm25.get_scores(tokenized_query)
-                top_indices = np.argsort(doc_scores)[::-1][:top_k]
+                query_tokens = self._tokenize_query(query)
+                if not query_tokens:
+                    return []
+
+                doc_scores = self._bm25_scores(query_tokens)
+                top_indices = _top_k_indices(doc_scores, top_k)
 
                 return [
                     {
@@ -220,7 +482,7 @@ class HybridRetriever:
                         "metadata": self.documents[i]["metadata"],
                         "source": "bm25"
                     }
-                    for i in top_indices if i < len(self.documents)
+                    for i in top_indices
                 ]
         except Exception as e:
             print(f"BM25检索错误: {e}")
@@ -228,7 +490,8 @@ class HybridRetriever:
         return []
 
     def _fuse_results(self, query: str, vector_results: List[Dict[str, Any]],
-                     keyword_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+                     keyword_results: List[Dict[str, Any]],
+                     top_k: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         融合向量检索和关键词检索结果
 
@@ -236,37 +499,22 @@ class HybridRetriever:
             query: 查询文本
             vector_results: 向量检索结果
             keyword_results: 关键词检索结果
+            top_k: 返回结果数量，为空时返回全部
 
         Returns:
             融合后的结果列表
         """
-        # 使用RRF(Reciprocal Rank Fusion)算法
-        fused_scores = {}
+        # 使用RRF(Reciprocal Rank Fusion)算法，单次遍历累加分数并记录首次出现的结果
+        fused_scores = defaultdict(float)
+        merged_results = {}
 
-        # 处理向量检索结果
-        for i, result in enumerate(vector_results):
-            doc_id = result["id"]
-            # RRF公式: 1 / (k + rank)，其中k是常数，通常取60
-            fused_scores[doc_id] = fused_scores.get(doc_id, 0) + 1.0 / (60.0 + i)
+        for results in (vector_results, keyword_results):
+            for weight, result in zip(_rrf_weights(len(results)), results):
+                doc_id = result["id"]
+                fused_scores[doc_id] += weight
+                merged_results.setdefault(doc_id, result)
 
-        # 处理关键词检索结果
-        for i, result in enumerate(keyword_results):
-            doc_id = result["id"]
-            fused_scores[doc_id] = fused_scores.get(doc_id, 0) + 1.0 / (60.0 + i)
+        # 只取前top_k个，无需对全部结果排序
+        top = heapq.nlargest(top_k or len(fused_scores), fused_scores.items(), key=lambda x: x[1])
 
-        # 合并结果
-        merged_results = {}
-        for result in vector_results + keyword_results:
-            doc_id = result["id"]
-            if doc_id not in merged_results:
-                merged_results[doc_id] = result
-
-        # 添加融合分数
-        final_results = []
-        for doc_id, score in sorted(fused_scores.items(), key=lambda x: x[1], reverse=True):
-            if doc_id in merged_results:
-                result = merged_results[doc_id].copy()
-                result["score"] = score
-                final_results.append(result)
-
-        return final_results
\ No newline at end of file
+        return [dict(merged_results[doc_id], score=score) for doc_id, score in top]
@@ -1,10 +1,38 @@
-from qdrant_client import QdrantClient, models
-from sentence_transformers import SentenceTransformer
 import os
-from typing import List, Dict, Any, Optional
+
+# 编码器的OpenMP/MKL线程数需在导入torch前设置，默认最多4个线程，避免与进程池和事件循环争抢CPU，
+# 可通过环境变量覆盖
+os.environ.setdefault("OMP_NUM_THREADS", str(min(4, os.cpu_count() or 1)))
+os.environ.setdefault("MKL_NUM_THREADS", os.environ["OMP_NUM_THREADS"])
+
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
+from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Optional, Set
 import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import uuid
 from functools import lru_cache
 
+from .embedding_batcher import EmbeddingBatcher
+from .onnx_encoder import OnnxEncoder
+
+def point_id(payload: Dict[str, Any], scope: str = "") -> str:
+    """
+    根据块内容生成确定性的点ID，内容不变时重复导入得到相同ID
+
+    Args:
+        payload: 载荷，优先使用其中的content_hash，否则对content计算哈希
+        scope: ID作用域（如文档ID），不同作用域下的相同内容得到不同ID
+
+    Returns:
+        UUID字符串
+    """
+    content_hash = payload.get("content_hash") or hashlib.blake2b(
+        payload.get("content", "").encode("utf-8"), digest_size=16
+    ).hexdigest()
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, scope + content_hash))
+
 class VectorService:
     def __init__(self, model_name: str = "BAAI/bge-large-zh-v1.5"):
         """
@@ -16,16 +44,47 @@ class VectorService:
         self.host = os.getenv("QDRANT_HOST", "localhost")
         self.port = int(os.getenv("QDRANT_PORT", "6333"))
         self.client = QdrantClient(self.host, port=self.port)
-        self.encoder = SentenceTransformer(model_name)
+        # 异步客户端，检索和写入时不阻塞事件循环
+        self.aclient = AsyncQdrantClient(self.host, port=self.port)
+        # 配置了导出的ONNX int8模型时使用ONNX Runtime编码，否则使用PyTorch模型
+        onnx_path = os.getenv("ENCODER_ONNX_PATH")
+        if onnx_path:
+            self.encoder = OnnxEncoder(onnx_path, pooling=os.getenv("ENCODER_ONNX_POOLING", "cls"))
+        else:
+            self.encoder = SentenceTransformer(model_name)
         self.vector_size = self.encoder.get_sentence_embedding_dimension()
 
-    def create_collection(self, collection_name: str = "docs"):
+        # 编码专用线程池，不与事件循环默认线程池上的其他阻塞任务争抢；
+        # 编码本身由torch多线程并行，单个工作线程即可避免BLAS线程过度订阅
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("ENCODER_WORKERS", "1")),
+            thread_name_prefix="encoder"
+        )
+
+        # 并发查询在短时间窗口内合并为一次批量编码
+        self._query_batcher = EmbeddingBatcher(
+            self.encode_async,
+            max_size=int(os.getenv("QUERY_BATCH_MAX_SIZE", "32")),
+            max_wait=float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5")) / 1000
+        )
+
+    async def close(self):
+        """停止查询编码合并任务，关闭异步客户端和编码线程池"""
+        await self._query_batcher.stop()
+        await self.aclient.close()
+        self._executor.shutdown(wait=False)
+
+    def create_collection(self, collection_name: str = "docs", recreate: bool = False):
         """
         创建向量集合
 
         Args:
             collection_name: 集合名称
+            recreate: 集合已存在时是否删除重建，默认保留已有数据
         """
+        if not recreate and self.client.collection_exists(collection_name):
+            return
+
         self.client.recreate_collection(
             collection_name=collection_name,
             vectors_config=models.VectorParams(
@@ -56,11 +115,12 @@ class VectorService:
         Returns:
             向量列表
         """
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.encode, texts)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.encode, texts)
 
     async def upsert(self, vectors: List[List[float]], payloads: List[Dict[str, Any]],
-                    collection_name: str = "docs", ids: Optional[List[str]] = None) -> bool:
+                    collection_name: str = "docs", ids: Optional[List[str]] = None,
+                    wait: bool = True) -> bool:
         """
         添加或更新向量
 
@@ -68,25 +128,82 @@ class VectorService:
             vectors: 向量列表
             payloads: 元数据列表
             collection_name: 集合名称
-            ids: 可选的ID列表
+            ids: 可选的ID列表，为空时按内容生成确定性ID，重复导入覆盖同一个点
+            wait: 是否等待Qdrant完成写入后再返回，批量导入时可设为False
 
         Returns:
             是否成功
         """
         try:
-            self.client.upsert(
+            await self.aclient.upsert(
                 collection_name=collection_name,
                 points=models.Batch(
                     vectors=vectors,
                     payloads=payloads,
-                    ids=ids or list(range(len(vectors)))
-                )
+                    ids=ids or [point_id(payload) for payload in payloads]
+                ),
+                wait=wait
             )
             return True
         except Exception as e:
             print(f"向量插入错误: {e}")
             return False
 
+    async def existing_ids(self, ids: List[str], collection_name: str = "docs") -> Set[str]:
+        """
+        查询集合中已存在的点ID，导入前用于跳过未变化的块
+
+        Args:
+            ids: 点ID列表
+            collection_name: 集合名称
+
+        Returns:
+            已存在的ID集合
+        """
+        if not ids:
+            return set()
+
+        points = await self.aclient.retrieve(
+            collection_name=collection_name,
+            ids=ids,
+            with_payload=False,
+            with_vectors=False
+        )
+        return {str(point.id) for point in points}
+
+    async def delete_except(self, key: str, value: Any, keep_ids: List[str],
+                            collection_name: str = "docs"):
+        """
+        删除载荷字段key等于value、但ID不在keep_ids中的点，用于清理重新导入后已过期的块
+
+        Args:
+            key: 载荷字段名
+            value: 载荷字段值
+            keep_ids: 需要保留的点ID
+            collection_name: 集合名称
+        """
+        await self.aclient.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[models.FieldCondition(key=key, match=models.MatchValue(value=value))],
+                    must_not=[models.HasIdCondition(has_id=keep_ids)]
+                )
+            )
+        )
+
+    async def encode_query(self, query: str) -> List[float]:
+        """
+        编码单条查询，与并发查询合并批量编码
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            查询向量
+        """
+        return await self._query_batcher.submit(query)
+
     async def search(self, query: str, top_k: int = 5,
                     collection_name: str = "docs") -> List[Dict[str, Any]]:
         """
@@ -100,12 +217,13 @@ class VectorService:
         Returns:
             搜索结果列表
         """
-        vector = await self.encode_async([query])
-        results = self.client.search(
+        vector = await self.encode_query(query)
+        results = await self.aclient.search(
             collection_name=collection_name,
-            query_vector=vector[0],
+            query_vector=vector,
             limit=top_k,
-            with_payload=True
+            with_payload=True,
+            search_params=models.SearchParams(hnsw_ef=64, exact=False)
         )
 
         return results
@@ -20,9 +20,10 @@ async def main():
     await retriever.initialize()
 
     # 执行检索
-    start_time = time.time()
+    start_time = time.perf_counter()
     results = await retriever.retrieve(query, top_k=5)
-    elapsed = time.time() - start_time
+    elapsed = time.perf_counter() - start_time
+    await retriever.close()
 
     # 打印结果
     print(f"\n查询耗时: {elapsed*1000:.2f}ms")
@@ -1,10 +1,13 @@
+import argparse
 import asyncio
+import multiprocessing
 import os
 import json
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any
 
-from services.vector import get_vector_service
+from services.vector import get_vector_service, point_id
 from services.document_processor import DocumentProcessor
 
 # 示例文档
@@ -195,55 +198,92 @@ def hierarchical_retrieval(query, corpus_retriever, doc_retriever):
     }
 ]
 
-async def main():
-    """导入示例文档"""
+async def main(recreate: bool = False):
+    """
+    导入示例文档
+
+    Args:
+        recreate: 是否删除并重建向量集合
+    """
     print("开始导入示例文档...")
 
     # 初始化服务
     vector_service = get_vector_service()
     processor = DocumentProcessor()
 
-    # 创建集合
+    # 创建集合（已存在时保留，重复导入只写入变化的块）
     try:
-        vector_service.create_collection("docs")
+        vector_service.create_collection("docs", recreate=recreate)
         print("创建向量集合成功")
     except Exception as e:
         print(f"创建集合失败（可能已存在）: {e}")
 
-    # 处理并导入文档
-    for i, doc in enumerate(SAMPLE_DOCS):
-        print(f"处理文档 {i+1}/{len(SAMPLE_DOCS)}: {doc['title']}")
-
-        # 处理文档
-        chunks = processor.process(
-            doc["content"],
-            "md",
-            {**doc["metadata"], "title": doc["title"]}
-        )
-
-        # 提取文本和元数据
-        texts = [chunk["content"] for chunk in chunks]
-        metadatas = [chunk["metadata"] for chunk in chunks]
-
-        # 生成向量
+    # 在进程池中并行分块处理所有文档
+    loop = asyncio.get_running_loop()
+    # 向量模型和编码线程已加载，使用forkserver启动子进程，避免fork多线程进程
+    with ProcessPoolExecutor(
+        max_workers=min(len(SAMPLE_DOCS), os.cpu_count() or 1),
+        mp_context=multiprocessing.get_context("forkserver")
+    ) as pool:
+        all_chunks = await asyncio.gather(*[
+            loop.run_in_executor(
+                pool,
+                processor.process,
+                doc["content"],
+                "md",
+                {**doc["metadata"], "title": doc["title"]}
+            )
+            for doc in SAMPLE_DOCS
+        ])
+
+    # 汇总所有文档的文本和载荷
+    texts = []
+    payloads = []
+    for doc, chunks in zip(SAMPLE_DOCS, all_chunks):
+        print(f"文档 {doc['title']}: {len(chunks)} 个块")
+        for chunk in chunks:
+            texts.append(chunk["content"])
+            payloads.append({
+                "content": chunk["content"],
+                "title": doc["title"],
+                **chunk["metadata"]
+            })
+
+    # 点ID由块内容决定，集合中已存在的块内容未变化，无需重新编码和写入
+    all_ids = [point_id(payload) for payload in payloads]
+    titles = [payload["title"] for payload in payloads]
+    existing = await vector_service.existing_ids(all_ids)
+    new_chunks = [
+        (point, text, payload)
+        for point, text, payload in zip(all_ids, texts, payloads)
+        if point not in existing
+    ]
+    print(f"跳过 {len(texts) - len(new_chunks)} 个未变化的块")
+
+    if new_chunks:
+        ids, texts, payloads = map(list, zip(*new_chunks))
+
+        # 一次批量编码所有块
         vectors = await vector_service.encode_async(texts)
 
-        # 存储向量
-        success = await vector_service.upsert(
-            vectors=vectors,
-            payloads=[{
-                "content": text,
-                "title": doc["title"],
-                **metadata
-            } for text, metadata in zip(texts, metadatas)]
-        )
+        # 一次批量写入，导入时不等待Qdrant确认写入落盘，提高吞吐
+        success = await vector_service.upsert(vectors=vectors, payloads=payloads, ids=ids, wait=False)
 
         if success:
-            print(f"  - 成功导入 {len(chunks)} 个块")
+            print(f"  - 成功导入 {len(texts)} 个块")
         else:
             print(f"  - 导入失败")
 
+    # 删除各文档中已不存在的旧块（包括旧版本脚本按序号写入的点）
+    for doc in SAMPLE_DOCS:
+        keep_ids = [point for point, title in zip(all_ids, titles) if title == doc["title"]]
+        await vector_service.delete_except("title", doc["title"], keep_ids)
+
     print("示例文档导入完成")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="导入示例文档")
+    parser.add_argument("--recreate", action="store_true", help="删除并重建向量集合")
+    args = parser.parse_args()
+
+    asyncio.run(main(recreate=args.recreate))
\ No newline at end of file